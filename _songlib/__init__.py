@@ -0,0 +1 @@
+"""Helpers shared by the song_uid scripts at the repo root."""
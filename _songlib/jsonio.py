@@ -0,0 +1,75 @@
+"""
+_songlib/jsonio.py
+------------------
+
+JSON in and out for the scripts at the repo root. orjson is used when it is
+installed; the stdlib fallback produces the same bytes, so outputs don't
+depend on which one ran.
+"""
+
+from __future__ import annotations
+import json, os
+from pathlib import Path
+from typing import Any, Dict
+
+try:
+    import orjson  # optional; falls back to stdlib json
+except ImportError:
+    orjson = None
+
+def encode_json(data: Any, newline: bool = True) -> bytes:
+    """
+    2-space indented UTF-8 JSON, with a trailing newline unless newline is
+    False (consolidate_library.py's outputs have none).
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE if newline else orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    text = json.dumps(data, indent=2, ensure_ascii=False)
+    return (text + "\n" if newline else text).encode("utf-8")
+
+def load_json(raw: bytes | str) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+def load_cache_entries(path: Path, version: int) -> Dict[str, Any]:
+    """
+    The "entries" object of a {"version", "entries"} cache file. A missing,
+    unreadable or other-version cache is simply empty.
+    """
+    try:
+        data = load_json(path.read_bytes())
+    except Exception:
+        return {}
+    if not isinstance(data, dict) or data.get("version") != version:
+        return {}
+    entries = data.get("entries")
+    return entries if isinstance(entries, dict) else {}
+
+def save_cache_entries(path: Path, version: int, entries: Dict[str, Any]):
+    # Derived data nobody reads by hand: no indentation
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps({"version": version, "entries": entries}, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+def atomic_write_bytes(path: Path, payload: bytes):
+    """
+    Write already-encoded JSON (see encode_json) via a temp file and rename.
+    An identical file is left alone, so no-op reruns don't bump its mtime.
+    """
+    try:
+        if os.path.getsize(path) == len(payload) and path.read_bytes() == payload:
+            return
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    # raw fd writes skip the text layer
+    fd = os.open(tmp, os.O_CREAT | os.O_TRUNC | os.O_WRONLY | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    os.replace(tmp, path)
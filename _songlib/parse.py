@@ -0,0 +1,210 @@
+"""
+_songlib/parse.py
+-----------------
+
+Shared tag-block parser and scanner for the song_uid scripts. The
+schema-compatible consolidator reads each sheet with sheet_tags() and the
+patched one with parse_one(); these go through scan_tags():
+
+  consolidate_library_v2.py
+  migrate_setlists_to_songuid.py
+  migrate_setlists_v2.py
+  migrate_all.py (runs the three above in one process)
+
+scan_tags() walks ./songs/ once with os.scandir, parses the top tag block of every sheet
+and keeps the results in:
+
+  library/.tag-cache.json
+
+keyed by "relpath|mtime_ns|size". On the next run only sheets whose key
+changed (edited, added) are read and parsed again; everything else is a
+stat call. The cache is derived data and safe to delete. Within one process
+the scan itself is memoized, so migrate_all walks songs/ only once.
+"""
+
+from __future__ import annotations
+import functools, os, re, sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from _songlib.jsonio import load_cache_entries, save_cache_entries
+from _songlib.walk import iter_cho, path_sort_key
+
+ROOT = Path(__file__).resolve().parent.parent
+SONGS_DIR = ROOT / "songs"
+LIB_DIR   = ROOT / "library"
+CACHE_FILE = LIB_DIR / ".tag-cache.json"
+
+# Bump when parse_tag_block output changes so stale caches are ignored
+CACHE_VERSION = 1
+
+# One header line per match: a {key: value} tag or a blank line, plus its
+# terminator. The character classes mirror str.splitlines()/str.strip(), so
+# finditer walks the same lines the old per-line loop did, but in C.
+_EOL = "\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029"
+_WS = rf"[^\S{_EOL}]"
+TAG_LINE_RE = re.compile(
+    rf"{_WS}*(?:\{{([^}}:{_EOL}]+):([^{_EOL}]*?)\}}{_WS}*)?(?:\r\n|[{_EOL}]|\Z)"
+)
+
+# Short/legacy tag -> canonical tag, applied once per tag block
+TAG_ALIASES = {"t": "title", "a": "artist", "version": "persona", "bpm": "tempo", "ca": "capo", "k": "key"}
+
+# Low-cardinality tags repeat across hundreds of sheets: intern to share one str each
+INTERNED_TAGS = ("persona", "version", "singer", "capo", "ca", "key", "k")
+
+# Tag blocks are a few hundred bytes; read sheets in small chunks and stop
+# at the first non-tag line instead of decoding the whole file
+HEAD_CHUNK = 4096
+
+# Sheets are read straight off a raw fd: open/read/close, without the
+# fstat/isatty/lseek calls a buffered open(path, "rb") adds per file
+O_RDONLY_BINARY = os.O_RDONLY | getattr(os, "O_BINARY", 0)
+
+def parse_tag_block(text: str, tags: Dict[str, str]) -> bool:
+    """
+    Add the tags at the top of text to tags. Returns False once a non-tag
+    line is reached, True if text was all tags and blank lines.
+    """
+    pos = 0
+    for m in TAG_LINE_RE.finditer(text):
+        if m.start() != pos:
+            return False
+        pos = m.end()
+        k = m.group(1)
+        if k is not None:
+            tags[k.strip().lower()] = m.group(2).strip()
+    return pos == len(text)
+
+def read_tags(fd: int) -> Dict[str, str]:
+    """
+    Parse the tag block of an open file descriptor, HEAD_CHUNK bytes at a time.
+    Chunks are only cut after a b"\n", so a multi-byte character or a
+    \r\n pair is never split across two parse_tag_block calls.
+    """
+    tags: Dict[str, str] = {}
+    buf = b""
+    while True:
+        chunk = os.read(fd, HEAD_CHUNK)
+        if not chunk:
+            parse_tag_block(buf.decode("utf-8", "replace"), tags)
+            return tags
+        buf += chunk
+        cut = buf.rfind(b"\n") + 1
+        if cut:
+            if not parse_tag_block(buf[:cut].decode("utf-8", "replace"), tags):
+                return tags
+            buf = buf[cut:]
+
+def sheet_tags(path: str) -> Dict[str, str]:
+    """Tags of one sheet; raises OSError if it can't be read."""
+    fd = os.open(path, O_RDONLY_BINARY)
+    try:
+        return read_tags(fd)
+    finally:
+        os.close(fd)
+
+def parse_one(path: str) -> Dict[str, str] | Exception:
+    """
+    Tags of one sheet. Read errors are returned rather than raised so one
+    bad file doesn't abort the whole scan.
+    """
+    try:
+        return sheet_tags(path)
+    except Exception as e:
+        return e
+
+def fold_aliases(tags: Dict[str, str]) -> Dict[str, str]:
+    for short, canonical in TAG_ALIASES.items():
+        if not tags.get(canonical) and tags.get(short):
+            tags[canonical] = tags[short]
+    return tags
+
+def intern_tags(tags: Dict[str, str]) -> Dict[str, str]:
+    for k in INTERNED_TAGS:
+        v = tags.get(k)
+        if v:
+            tags[k] = sys.intern(v)
+    return tags
+
+def relpath(path: str, root: str = str(ROOT)) -> str:
+    """path relative to root (the repo by default), with forward slashes."""
+    # Scanned paths all start with root, so a prefix strip replaces os.path.relpath
+    prefix = root + os.sep
+    if path.startswith(prefix):
+        return path[len(prefix):].replace("\\", "/")
+    return os.path.relpath(path, root).replace("\\", "/")
+
+def load_cache() -> Dict[str, Dict[str, str]]:
+    entries = load_cache_entries(CACHE_FILE, CACHE_VERSION)
+    # Anything but a {tag: str} dict is dropped, so that sheet is parsed again
+    return {
+        key: tags for key, tags in entries.items()
+        if isinstance(tags, dict) and all(isinstance(v, str) for v in tags.values())
+    }
+
+@functools.cache
+def scan_tags() -> List[Tuple[str, Dict[str, str] | Exception]]:
+    """
+    Return (path, tags) for every sheet under SONGS_DIR, sorted by path,
+    with INTERNED_TAGS values interned.
+    A sheet that can't be read comes back with the exception in place of
+    its tags and is left out of the cache. Cached tags are reused when a
+    sheet's relpath, mtime and size all match; the cache is rewritten to
+    hold exactly the current sheets. Memoized per process: treat the result
+    as read-only. A missing SONGS_DIR scans as no sheets.
+    """
+    if not SONGS_DIR.is_dir():
+        return []
+    cache = load_cache()
+    fresh: Dict[str, Dict[str, str]] = {}
+    out: List[Tuple[str, Dict[str, str] | Exception]] = []
+
+    sheets: List[Tuple[str, str]] = []
+    for e in iter_cho(str(SONGS_DIR)):
+        try:
+            st = e.stat()
+        except OSError:
+            # never a cache key: parse_one reports the error (e.g. a dangling symlink)
+            sheets.append((e.path, ""))
+            continue
+        sheets.append((e.path, f"{relpath(e.path)}|{st.st_mtime_ns}|{st.st_size}"))
+    sheets.sort(key=lambda sheet: path_sort_key(sheet[0]))
+
+    misses = [path for path, key in sheets if key not in cache]
+    parsed = dict(zip(misses, map(parse_one, misses)))
+
+    for path, key in sheets:
+        tags = cache.get(key)
+        if tags is None:
+            tags = parsed[path]
+            if isinstance(tags, Exception):
+                out.append((path, tags))
+                continue
+        fresh[key] = tags
+        out.append((path, intern_tags(tags)))
+
+    if fresh != cache:
+        try:
+            save_cache_entries(CACHE_FILE, CACHE_VERSION, fresh)
+        except OSError:
+            pass  # a read-only checkout still works, just without the cache
+    return out
+
+def scan_errors() -> List[Tuple[str, Exception]]:
+    """(path, error) for every sheet scan_tags() couldn't read."""
+    return [(path, tags) for path, tags in scan_tags() if isinstance(tags, Exception)]
+
+@functools.cache
+def get_uid_map() -> Dict[str, str]:
+    """Sheet uid -> canonical song_uid, for every readable sheet that has both."""
+    m: Dict[str, str] = {}
+    for _, tags in scan_tags():
+        if isinstance(tags, Exception):
+            continue
+        # parse_tag_block already strips values
+        uid = tags.get("uid")
+        song_uid = tags.get("song_uid")
+        if uid and song_uid:
+            m[uid] = song_uid
+    return m
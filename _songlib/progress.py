@@ -0,0 +1,26 @@
+"""
+_songlib/progress.py
+--------------------
+
+The "...parsed i/n" progress lines the scanning scripts print.
+"""
+
+from __future__ import annotations
+import time
+from typing import Iterator, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# Progress lines are throttled by wall clock (seconds), not by sheet count
+LOG_INTERVAL = 1.0
+
+def progress(items: Sequence[T]) -> Iterator[T]:
+    """Yield items, printing "  ...parsed i/n" at most once per LOG_INTERVAL."""
+    total = len(items)
+    next_log = time.monotonic() + LOG_INTERVAL
+    for i, item in enumerate(items, start=1):
+        now = time.monotonic()
+        if now >= next_log:
+            print(f"  ...parsed {i}/{total}", flush=True)
+            next_log = now + LOG_INTERVAL
+        yield item
@@ -0,0 +1,44 @@
+"""
+_songlib/walk.py
+----------------
+
+The one sheet walker every script at the repo root uses to find .cho files.
+"""
+
+from __future__ import annotations
+import os
+from typing import Iterator, List, Tuple
+
+CHO_EXTS = (".cho", ".chopro", ".pro")
+# Directory names never worth descending into while looking for sheets
+SKIP_DIRS = frozenset({".git", "node_modules", "library"})
+
+def iter_cho(root: str, exts: Tuple[str, ...] = CHO_EXTS) -> Iterator[os.DirEntry]:
+    """
+    Yield a DirEntry for every file under root whose name ends with one of
+    exts. Walks with os.scandir using an explicit stack; directories in
+    SKIP_DIRS are not entered. A missing root or a directory that can't be
+    listed yields nothing, as with Path.rglob.
+    """
+    # normcase() folds case on Windows only, matching what Path.rglob did per platform
+    normcase = os.path.normcase
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except (FileNotFoundError, PermissionError):
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(entry.path)
+                elif normcase(entry.name).endswith(exts):
+                    yield entry
+
+def path_sort_key(path: str) -> List[str]:
+    """
+    Sort key that orders path strings the way sorted() orders the matching
+    Path objects: part by part, case-folded on Windows.
+    """
+    return os.path.normcase(path).split(os.sep)
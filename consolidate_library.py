@@ -10,6 +10,7 @@ Writes (derived):
   - ./library/songs.index.json
   - ./library/library.index.json
   - ./library/consolidate.log.json
+  - ./library/.parse-cache.json  (tag cache, safe to delete)
 
 Safety:
   - DOES NOT modify .cho files
@@ -18,16 +19,47 @@ Safety:
 from __future__ import annotations
 
 import argparse
-import json
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+from _songlib.jsonio import encode_json, load_cache_entries, load_json, save_cache_entries
+from _songlib.parse import relpath
+from _songlib.walk import iter_cho, path_sort_key
+
 TAG_RE = re.compile(r"^\s*\{([a-zA-Z0-9_\-]+)\s*:\s*(.*?)\}\s*$")
 
+# Tags consumed by meta_from_tags(); once all are seen the rest of a sheet is skipped
+WANTED_TAGS = frozenset({
+    "uid", "song_uid", "title", "artist", "persona", "singer",
+    "version", "duration", "tempo", "key", "capo",
+})
+# (alias, canonical) pairs folded by parse_tags_from_cho(); earlier aliases win
+TAG_ALIASES = (
+    ("songuid", "song_uid"),
+    ("song-id", "song_uid"),
+    ("song_id", "song_uid"),
+)
+# Give up looking for tags after this many consecutive non-tag lines
+MAX_NON_TAG_RUN = 50
+
+# Encode the shared songs array once and splice it into both index files.
+# Set to False to fall back to encoding each index independently.
+SHARE_SONGS_BLOB = True
+# Stand-in for the songs array while encoding an envelope; NULs never occur in song data
+SONGS_SENTINEL = "\x00songs\x00"
+
+# Per-sheet parse results keyed by (relpath, size, mtime_ns), kept in library/
+PARSE_CACHE_NAME = ".parse-cache.json"
+# Bump when parse_tags_from_cho() output changes so old caches are ignored
+PARSE_CACHE_VERSION = 2
+
+CHO_EXTS = (".cho",)
+
 
 @dataclass
 class SongFileMeta:
@@ -53,6 +85,32 @@ def read_text(path: Path) -> str:
     return path.read_text(encoding="utf-8", errors="replace")
 
 
+def dump_json(path: Path, obj) -> None:
+    path.write_bytes(encode_json(obj, newline=False))
+
+
+def encode_songs_once(songs: list) -> bytes:
+    """
+    Encodes the songs array exactly as it appears one level deep in an index
+    envelope, so it can be spliced into both outputs without re-encoding.
+    """
+    blob = encode_json({"songs": songs}, newline=False)
+    return blob[len(b'{\n  "songs": '):-len(b"\n}")]
+
+
+def encode_envelope(envelope: dict, songs_blob: bytes) -> bytes:
+    """Encodes envelope with its "songs" value replaced by songs_blob."""
+    head = encode_json({**envelope, "songs": SONGS_SENTINEL}, newline=False)
+    return head.replace(encode_json(SONGS_SENTINEL, newline=False), songs_blob, 1)
+
+
+def write_all(payloads: List[Tuple[Path, bytes]]) -> None:
+    """Writes pre-encoded files concurrently so their disk I/O overlaps."""
+    with ThreadPoolExecutor(max_workers=len(payloads)) as ex:
+        # list() so a failed write re-raises here
+        list(ex.map(lambda item: item[0].write_bytes(item[1]), payloads))
+
+
 def parse_int(value: str) -> Optional[int]:
     try:
         return int(str(value).strip())
@@ -64,16 +122,32 @@ def parse_tags_from_cho(text: str) -> Dict[str, str]:
     """
     Parses top-level ChordPro tags of form {tag: value}.
     If a tag appears multiple times, first occurrence wins (stable).
+
+    Stops early once every tag meta_from_tags() reads has been seen, or after
+    MAX_NON_TAG_RUN consecutive lines without a tag (deep into the lyrics).
     """
     tags: Dict[str, str] = {}
+    match = TAG_RE.match
+    non_tag_run = 0
     for line in text.splitlines():
-        m = TAG_RE.match(line)
+        # Cheap literal check first: lyric/chord lines never reach the regex
+        m = match(line) if "{" in line else None
         if not m:
+            non_tag_run += 1
+            if non_tag_run >= MAX_NON_TAG_RUN:
+                break
             continue
+        non_tag_run = 0
         k = m.group(1).strip().lower()
         v = m.group(2).strip()
         if k not in tags:
             tags[k] = v
+            if WANTED_TAGS <= tags.keys():
+                break
+    # Fold legacy spellings into their canonical tag once, in priority order
+    for alias, canonical in TAG_ALIASES:
+        if not tags.get(canonical) and tags.get(alias):
+            tags[canonical] = tags[alias]
     return tags
 
 
@@ -81,7 +155,7 @@ def meta_from_tags(tags: Dict[str, str]) -> SongFileMeta:
     # uid = sheet/file identifier (unique per songsheet)
     uid = tags.get("uid")
     # song_uid = canonical song identifier shared across versions/personas
-    song_uid = tags.get("song_uid") or tags.get("songuid") or tags.get("song-id") or tags.get("song_id")
+    song_uid = tags.get("song_uid")
 
     title = tags.get("title")
     artist = tags.get("artist")
@@ -108,8 +182,64 @@ def meta_from_tags(tags: Dict[str, str]) -> SongFileMeta:
     )
 
 
-def relpath(from_dir: Path, to_path: Path) -> str:
-    return os.path.relpath(to_path.resolve(), from_dir.resolve()).replace("\\", "/")
+def parse_one(path: str) -> Tuple[str, Dict[str, str]]:
+    """Reads and parses one sheet."""
+    return path, parse_tags_from_cho(read_text(Path(path)))
+
+
+def load_parse_cache(cache_path: Path) -> Dict[str, dict]:
+    """
+    Loads the parse cache: { relpath: {"size", "mtime_ns", "tags"} }.
+    A missing, unreadable or other-version cache is simply empty, and any
+    malformed entry is dropped so its sheet is parsed again.
+    """
+    entries = load_cache_entries(cache_path, PARSE_CACHE_VERSION)
+    return {rel: entry for rel, entry in entries.items() if valid_cache_entry(entry)}
+
+
+def valid_cache_entry(entry) -> bool:
+    """True for {"size": int, "mtime_ns": int, "tags": {str: str}}."""
+    if not isinstance(entry, dict):
+        return False
+    tags = entry.get("tags")
+    return (
+        isinstance(entry.get("size"), int)
+        and isinstance(entry.get("mtime_ns"), int)
+        and isinstance(tags, dict)
+        and all(isinstance(v, str) for v in tags.values())
+    )
+
+
+def parse_cached(
+    root_str: str, paths: List[str], cache: Dict[str, dict]
+) -> Tuple[List[Tuple[str, Dict[str, str]]], Dict[str, dict], int]:
+    """
+    Returns (path, tags) for every path in order, reusing cached tags when a
+    sheet's size and mtime_ns are unchanged and parsing only the rest.
+    Also returns the refreshed cache entries and the number of hits.
+    """
+    tags_by_path: Dict[str, Dict[str, str]] = {}
+    entries: Dict[str, dict] = {}
+    stale: List[str] = []
+    stats = {}
+    for path in paths:
+        st = os.stat(path)
+        rel = relpath(path, root_str)
+        hit = cache.get(rel)
+        if hit and hit.get("size") == st.st_size and hit.get("mtime_ns") == st.st_mtime_ns:
+            tags_by_path[path] = hit["tags"]
+            entries[rel] = hit
+        else:
+            stale.append(path)
+            stats[path] = (rel, st)
+
+    for path, tags in map(parse_one, stale):
+        rel, st = stats[path]
+        tags_by_path[path] = tags
+        entries[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "tags": tags}
+
+    hits = len(paths) - len(stale)
+    return [(path, tags_by_path[path]) for path in paths], entries, hits
 
 
 def load_setlists(setlists_path: Path) -> dict:
@@ -122,7 +252,7 @@ def load_setlists(setlists_path: Path) -> dict:
         return {"version": 1, "updated": now_iso_local(), "collections": []}
 
     try:
-        data = json.loads(read_text(setlists_path))
+        data = load_json(read_text(setlists_path))
         if not isinstance(data, dict):
             raise ValueError("setlists.json is not a JSON object")
 
@@ -171,11 +301,12 @@ def consolidate(repo_root: Path, verbose: bool = True) -> Tuple[dict, dict, dict
 
     run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
     started = now_iso_local()
+    root_str = str(repo_root.resolve())
 
     log = {
         "runId": run_id,
         "started": started,
-        "repoRoot": str(repo_root.resolve()),
+        "repoRoot": root_str,
         "inputs": {
             "songsDir": str(songs_dir.resolve()),
             "setlists": str(setlists_path.resolve()),
@@ -188,6 +319,7 @@ def consolidate(repo_root: Path, verbose: bool = True) -> Tuple[dict, dict, dict
             "setlists": 0,
             "setlistSongsReferenced": 0,
             "setlistMissingUids": 0,
+            "parseCacheHits": 0,
         },
         "warnings": [],
         "errors": [],
@@ -210,7 +342,8 @@ def consolidate(repo_root: Path, verbose: bool = True) -> Tuple[dict, dict, dict
     log["counts"]["setlists"] = len(setlists.get("collections", []))
 
     # Scan .cho files
-    cho_files = sorted(songs_dir.rglob("*.cho"))
+    # Walk from the resolved root so relpath() can strip the prefix
+    cho_files = sorted([e.path for e in iter_cho(os.path.join(root_str, "songs"), CHO_EXTS)], key=path_sort_key)
     log["counts"]["choFilesFound"] = len(cho_files)
 
     # Index by canonical song_uid (falls back to uid when missing)
@@ -219,53 +352,54 @@ def consolidate(repo_root: Path, verbose: bool = True) -> Tuple[dict, dict, dict
     uid_to_song_uid: Dict[str, str] = {}
     missing_uid_files: List[str] = []
 
-    for f in cho_files:
-        text = read_text(f)
-        tags = parse_tags_from_cho(text)
+    # Re-parse only sheets whose size/mtime changed since the last run
+    cache_path = library_dir / PARSE_CACHE_NAME
+    cache = load_parse_cache(cache_path)
+    parsed, cache_entries, cache_hits = parse_cached(root_str, cho_files, cache)
+    log["counts"]["parseCacheHits"] = cache_hits
+    # A warm run with nothing added, edited or removed leaves the cache file alone
+    if cache_entries != cache:
+        try:
+            save_cache_entries(cache_path, PARSE_CACHE_VERSION, cache_entries)
+        except OSError as e:
+            log["warnings"].append(f"Could not write parse cache {cache_path}: {e}")
+
+    # Bound once: the loop below may warn several times per sheet
+    warn = log["warnings"].append
+    counts = log["counts"]
+
+    for path, tags in parsed:
         meta = meta_from_tags(tags)
+        persona = (meta.persona or "").strip() or None
+        sheet_uid = (meta.uid or "").strip() or None
+        song_uid = (meta.song_uid or "").strip() or None
 
-persona = (meta.persona or "").strip() or None
-sheet_uid = (meta.uid or "").strip() or None
-song_uid = (meta.song_uid or "").strip() or None
-
-if not sheet_uid:
-    missing_uid_files.append(relpath(repo_root, f))
-    continue
-
-# Canonical key for the song (preferred), falls back to sheet uid (legacy)
-song_key = song_uid or sheet_uid
-uid_to_song_uid[sheet_uid] = song_key
-
-rec = songs_by_song_uid.get(song_key)
-if rec is None:
-    rec = {
-        # Keep uid field stable as the canonical song id so UI components can use it as a single "song row"
-        "uid": song_key,
-        "song_uid": song_key,
-        "title": meta.title,
-        "artist": meta.artist,
-        "personas": [],
-        "singer": meta.singer,
-        "duration": meta.duration,
-        "tempo": meta.tempo,
-        "key": meta.key,
-        "capo": meta.capo,
-        "files": {},      # persona -> relative file path
-        "sheet_uids": {}, # persona -> sheet uid (for traceability)
-    }
-    songs_by_song_uid[song_key] = rec
+        if not sheet_uid:
+            missing_uid_files.append(relpath(path, root_str))
+            continue
 
+        # Canonical key for the song (preferred), falls back to sheet uid (legacy)
+        song_key = song_uid or sheet_uid
+        uid_to_song_uid[sheet_uid] = song_key
+
+        rec = songs_by_song_uid.get(song_key)
+        if rec is None:
+            rec = {
+                # Keep uid field stable as the canonical song id so UI components can use it as a single "song row"
+                "uid": song_key,
+                "song_uid": song_key,
                 "title": meta.title,
                 "artist": meta.artist,
-                "personas": [],
+                "personas": {},   # ordered set: persona -> None, listed at the end
                 "singer": meta.singer,
                 "duration": meta.duration,
                 "tempo": meta.tempo,
                 "key": meta.key,
                 "capo": meta.capo,
-                "files": {},  # persona -> relative file path
+                "files": {},      # persona -> relative file path
+                "sheet_uids": {}, # persona -> sheet uid (for traceability)
             }
-            songs_by_uid[uid] = rec
+            songs_by_song_uid[song_key] = rec
 
         # Fill gaps only (stable)
         for k, v in [
@@ -281,15 +415,14 @@ if rec is None:
                 rec[k] = v
 
         # Track persona -> file
-        this_path = relpath(repo_root, f)
+        this_path = relpath(path, root_str)
         if persona:
-            if persona not in rec["personas"]:
-                rec["personas"].append(persona)
+            rec["personas"][persona] = None
 
             existing = rec["files"].get(persona)
             if existing and existing != this_path:
-                log["counts"]["uidCollisionsPersona"] += 1
-                log["warnings"].append(
+                counts["uidCollisionsPersona"] += 1
+                warn(
                     f"SONG_UID {song_key} has multiple files for persona '{persona}'. Keeping first: {existing}; ignoring: {this_path}"
                 )
             else:
@@ -299,14 +432,14 @@ if rec is None:
             fallback_key = "_default"
             if fallback_key not in rec["files"]:
                 rec["files"][fallback_key] = this_path
-                log["warnings"].append(
+                warn(
                     f"SONG_UID {song_key} file missing persona tag. Using fallback '_default': {this_path}"
                 )
 
         if not meta.title:
-            log["warnings"].append(f"UID {uid} missing {{title:}} in {this_path}")
+            warn(f"UID {sheet_uid} missing {{title:}} in {this_path}")
         if not meta.artist:
-            log["warnings"].append(f"UID {uid} missing {{artist:}} in {this_path}")
+            warn(f"UID {sheet_uid} missing {{artist:}} in {this_path}")
 
     log["counts"]["uidsMissing"] = len(missing_uid_files)
     if missing_uid_files:
@@ -316,10 +449,16 @@ if rec is None:
             log["warnings"].append(f"...and {len(missing_uid_files) - 50} more files missing UID")
 
     # Build songs.index.json
-    songs_list = sorted(
-        songs_by_song_uid.values(),
-        key=lambda r: ((r.get("title") or ""), (r.get("artist") or ""), r["uid"])
-    )
+    for r in songs_by_song_uid.values():
+        r["personas"] = list(r["personas"])
+
+    # Decorate once per record; uid is unique so the records themselves are never compared
+    decorated = [
+        ((r.get("title") or "", r.get("artist") or "", r["uid"]), r)
+        for r in songs_by_song_uid.values()
+    ]
+    decorated.sort()
+    songs_list = [r for _, r in decorated]
 
     songs_index = {
         "generated": now_iso_local(),
@@ -329,26 +468,25 @@ if rec is None:
     log["counts"]["songsIndexed"] = len(songs_list)
 
     # Validate setlists against known UIDs
-    missing_uids: List[str] = []
-    referenced = 0
-
+    referenced_uids: List[str] = []
     for col in setlists.get("collections", []):
-        sets = col.get("sets", [])
-        for s in sets:
+        for s in col.get("sets", []):
             uids = s.get("songs", [])
             if isinstance(uids, list):
-                for uid in uids:
-                    referenced += 1
-                    # Setlists may reference either canonical song_uid or legacy sheet uid
-                    canon = uid_to_song_uid.get(str(uid), str(uid))
-                    if canon not in songs_by_song_uid:
-                        missing_uids.append(str(uid))
+                referenced_uids.extend(map(str, uids))
 
-    log["counts"]["setlistSongsReferenced"] = referenced
-    log["counts"]["setlistMissingUids"] = len(missing_uids)
+    # Setlists may reference either canonical song_uid or legacy sheet uid;
+    # every sheet uid maps to a known song, so one set difference covers both
+    missing_uids = set(referenced_uids) - songs_by_song_uid.keys() - uid_to_song_uid.keys()
+
+    log["counts"]["setlistSongsReferenced"] = len(referenced_uids)
+    # Counts references (a uid missing from two sets counts twice)
+    log["counts"]["setlistMissingUids"] = (
+        sum(1 for uid in referenced_uids if uid in missing_uids) if missing_uids else 0
+    )
 
     if missing_uids:
-        uniq = sorted(set(missing_uids))
+        uniq = sorted(missing_uids)
         for uid in uniq[:50]:
             log["warnings"].append(f"Setlists reference missing UID: {uid}")
         if len(uniq) > 50:
@@ -385,13 +523,24 @@ def main() -> int:
         for e in log["errors"]:
             print(" -", e)
         library_dir.mkdir(parents=True, exist_ok=True)
-        out_log.write_text(json.dumps(log, indent=2), encoding="utf-8")
+        dump_json(out_log, log)
         print(f"Log written: {out_log}")
         return 1
 
-    out_songs.write_text(json.dumps(songs_index, indent=2), encoding="utf-8")
-    out_library.write_text(json.dumps(library_index, indent=2), encoding="utf-8")
-    out_log.write_text(json.dumps(log, indent=2), encoding="utf-8")
+    if SHARE_SONGS_BLOB:
+        # Both indexes carry the same songs list: encode it once
+        songs_blob = encode_songs_once(songs_index["songs"])
+        payload_songs = encode_envelope(songs_index, songs_blob)
+        payload_library = encode_envelope(library_index, songs_blob)
+    else:
+        payload_songs = encode_json(songs_index, newline=False)
+        payload_library = encode_json(library_index, newline=False)
+
+    write_all([
+        (out_songs, payload_songs),
+        (out_library, payload_library),
+        (out_log, encode_json(log, newline=False)),
+    ])
 
     if not args.quiet:
         print("✅ Consolidation complete")
@@ -19,9 +19,14 @@ Why this exists:
 """
 
 from __future__ import annotations
-import os, json, re, sys, time
+import re, sys, time
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, NamedTuple, Tuple
+
+from _songlib.jsonio import atomic_write_bytes, encode_json, load_json
+from _songlib.parse import fold_aliases, intern_tags, parse_one, relpath
+from _songlib.progress import progress
+from _songlib.walk import iter_cho, path_sort_key
 
 ROOT = Path(__file__).resolve().parent
 SONGS_DIR = ROOT / "songs"
@@ -29,35 +34,27 @@ LIB_DIR   = ROOT / "library"
 OUT_SONGS = LIB_DIR / "songs.index.json"
 OUT_LIB   = LIB_DIR / "library.index.json"
 
-CHO_EXTS = (".cho", ".chopro", ".pro")
 
-TAG_LINE_RE = re.compile(r'^\s*\{([^}:]+)\s*:\s*(.*?)\}\s*$', re.I)
+# {duration: m:ss} / {duration: mm:ss}
+DUR_RE = re.compile(r'^(\d+)\s*:\s*(\d{1,2})$')
+
+class Sheet(NamedTuple):
+    """One parsed song file; turned into a dict only when written out."""
+    uid: str | None
+    song_uid: str | None
+    title: str
+    artist: str
+    persona: str
+    singer: str
+    tempo: int | None
+    duration_s: int | None
+    capo: str
+    key: str
+    path: str
 
 def log(msg: str):
     print(msg, flush=True)
 
-def read_text(p: Path) -> str:
-    return p.read_text(encoding="utf-8", errors="replace")
-
-def parse_tag_block(text: str) -> Dict[str, str]:
-    """
-    Parse only the initial tag block (contiguous {tag: value} lines at the top).
-    Stops when the first non-tag, non-blank line is encountered.
-    """
-    tags: Dict[str, str] = {}
-    for line in text.splitlines():
-        s = line.strip()
-        if s == "":
-            # allow blank lines inside tag block
-            continue
-        m = TAG_LINE_RE.match(s)
-        if not m:
-            break
-        k = m.group(1).strip().lower()
-        v = m.group(2).strip()
-        tags[k] = v
-    return tags
-
 def safe_int(v: str) -> int | None:
     try:
         return int(str(v).strip())
@@ -68,7 +65,7 @@ def parse_duration_to_seconds(v: str) -> int | None:
     v = str(v or "").strip()
     if not v: return None
     # m:ss or mm:ss
-    m = re.match(r'^(\d+)\s*:\s*(\d{1,2})$', v)
+    m = DUR_RE.match(v)
     if m:
         mins = int(m.group(1))
         secs = int(m.group(2))
@@ -77,12 +74,6 @@ def parse_duration_to_seconds(v: str) -> int | None:
     i = safe_int(v)
     return i
 
-def atomic_write_json(path: Path, data: Any):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
-    tmp.replace(path)
-
 def main():
     t0 = time.time()
 
@@ -92,58 +83,52 @@ def main():
 
     LIB_DIR.mkdir(parents=True, exist_ok=True)
 
-    files: List[Path] = []
-    for ext in CHO_EXTS:
-        files.extend(SONGS_DIR.rglob(f"*{ext}"))
-    files = sorted(set(files))
+    files: List[str] = sorted([e.path for e in iter_cho(str(SONGS_DIR))], key=path_sort_key)
 
     log(f"Scanning {len(files)} song files under: {SONGS_DIR}")
 
     by_song: Dict[str, Dict[str, Any]] = {}  # song_uid -> canonical entry with versions
-    orphan_sheets: List[Dict[str, Any]] = []
+    orphan_sheets: List[Sheet] = []
 
-    for idx, p in enumerate(files, start=1):
-        if idx % 200 == 0:
-            log(f"  ...parsed {idx}/{len(files)}")
-        try:
-            text = read_text(p)
-        except Exception as e:
-            log(f"WARN: failed read {p}: {e}")
+    for path in progress(files):
+        p = Path(path)
+        tags = parse_one(path)
+        if isinstance(tags, Exception):
+            log(f"WARN: failed read {p}: {tags}")
             continue
 
-        tags = parse_tag_block(text)
-
-        sheet_uid = tags.get("uid", "").strip()
-        song_uid  = tags.get("song_uid", "").strip()
+        # values come back stripped; fold aliases once so each field is one lookup
+        tags = intern_tags(fold_aliases(tags))
+        sheet_uid = tags.get("uid", "")
+        song_uid  = tags.get("song_uid", "")
 
-        title  = tags.get("title") or tags.get("t") or p.stem
-        artist = tags.get("artist") or tags.get("a") or ""
+        title  = tags.get("title") or p.stem
+        artist = tags.get("artist") or ""
 
-        persona = tags.get("persona") or tags.get("version") or ""
+        persona = tags.get("persona") or ""
         singer  = tags.get("singer") or ""
 
-        tempo = tags.get("tempo") or tags.get("bpm") or ""
-        tempo_i = safe_int(tempo) if tempo else None
-
-        dur_s = parse_duration_to_seconds(tags.get("duration",""))
-        capo  = tags.get("capo") or tags.get("ca") or ""
-        key   = tags.get("key") or tags.get("k") or ""
-
-        rel = str(p.relative_to(ROOT)).replace("\\", "/")
-
-        sheet = {
-            "uid": sheet_uid or None,
-            "song_uid": song_uid or None,
-            "title": title,
-            "artist": artist,
-            "persona": persona,
-            "singer": singer,
-            "tempo": tempo_i,
-            "duration_s": dur_s,
-            "capo": capo,
-            "key": key,
-            "path": rel,
-        }
+        tempo_i = safe_int(tags.get("tempo", ""))
+
+        dur_s = parse_duration_to_seconds(tags.get("duration", ""))
+        capo  = tags.get("capo") or ""
+        key   = tags.get("key") or ""
+
+        rel = relpath(path)
+
+        sheet = Sheet(
+            uid=sheet_uid or None,
+            song_uid=song_uid or None,
+            title=title,
+            artist=artist,
+            persona=persona,
+            singer=singer,
+            tempo=tempo_i,
+            duration_s=dur_s,
+            capo=capo,
+            key=key,
+            path=rel,
+        )
 
         if not song_uid:
             # If a file lacks song_uid, we can't canonicalize it safely.
@@ -167,28 +152,30 @@ def main():
             entry["personas"].add(persona)
         entry["paths"].append(rel)
 
-    # finalize sets -> lists
-    songs_out: List[Dict[str, Any]] = []
+    # finalize sets -> lists; sort key is built once per song (index breaks ties stably)
+    decorated: List[Tuple[Tuple[str, str], int, Dict[str, Any]]] = []
     for song_uid, entry in by_song.items():
-        personas = sorted(list(entry["personas"]))
+        personas = sorted(entry["personas"])
         entry["personas"] = personas
         # remove duplicates
-        entry["paths"] = sorted(list(set(entry["paths"])))
+        entry["paths"] = sorted(dict.fromkeys(entry["paths"]))
 
-        # choose a "display" representative: prefer first version
-        rep = entry["versions"][0] if entry["versions"] else {}
-        entry["duration_s"] = rep.get("duration_s")
-        entry["tempo"] = rep.get("tempo")
-        songs_out.append(entry)
+        # choose a "display" representative: prefer first version (there is always one)
+        rep = entry["versions"][0]
+        entry["duration_s"] = rep.duration_s
+        entry["tempo"] = rep.tempo
+        entry["versions"] = [v._asdict() for v in entry["versions"]]
+        decorated.append(((str(entry["artist"]).lower(), str(entry["title"]).lower()), len(decorated), entry))
 
-    songs_out = sorted(songs_out, key=lambda x: (str(x.get("artist","")).lower(), str(x.get("title","")).lower()))
+    decorated.sort()
+    songs_out: List[Dict[str, Any]] = [entry for _, _, entry in decorated]
 
     # Load collections/setlists if they exist
     setlists_path = LIB_DIR / "setlists.json"
     setlists = None
     if setlists_path.exists():
         try:
-            setlists = json.loads(setlists_path.read_text(encoding="utf-8"))
+            setlists = load_json(setlists_path.read_bytes())
         except Exception as e:
             log(f"WARN: couldn't parse {setlists_path}: {e}")
 
@@ -200,8 +187,8 @@ def main():
     if setlists is not None:
         library_out["setlists"] = setlists
 
-    atomic_write_json(OUT_SONGS, songs_out)
-    atomic_write_json(OUT_LIB, library_out)
+    atomic_write_bytes(OUT_SONGS, encode_json(songs_out))
+    atomic_write_bytes(OUT_LIB, encode_json(library_out))
 
     dt = time.time() - t0
     log(f"Done. Wrote:\n  {OUT_SONGS}\n  {OUT_LIB}\nSongs: {len(songs_out)} | Orphan sheets (missing song_uid): {len(orphan_sheets)} | {dt:.2f}s")
@@ -48,9 +48,14 @@ Notes:
 """
 
 from __future__ import annotations
-import json, re, time, sys
+import sys
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, NamedTuple, Tuple
+
+from _songlib.jsonio import atomic_write_bytes, encode_json, load_json
+from _songlib.parse import fold_aliases, intern_tags, relpath, sheet_tags
+from _songlib.progress import progress
+from _songlib.walk import iter_cho, path_sort_key
 
 ROOT = Path(__file__).resolve().parent
 SONGS_DIR = ROOT / "songs"
@@ -58,41 +63,26 @@ LIB_DIR   = ROOT / "library"
 OUT_SONGS = LIB_DIR / "songs.index.json"
 OUT_LIB   = LIB_DIR / "library.index.json"
 
-TAG_LINE_RE = re.compile(r'^\s*\{([^}:]+)\s*:\s*(.*?)\}\s*$', re.I)
-CHO_EXTS = (".cho", ".chopro", ".pro")
-
 PREFERRED_PERSONA = "Adam"
 
+class SheetMeta(NamedTuple):
+  # Per-persona representative fields; fixed layout instead of a dict per sheet
+  uid: str = ""
+  singer: str = ""
+  duration: str = ""
+  tempo: int | None = None
+  capo: str = ""
+  key: str = ""
+
 def log(msg: str):
   print(msg, flush=True)
 
-def parse_tag_block(text: str) -> Dict[str, str]:
-  tags: Dict[str, str] = {}
-  for line in text.splitlines():
-    s = line.strip()
-    if s == "":
-      continue
-    m = TAG_LINE_RE.match(s)
-    if not m:
-      break
-    tags[m.group(1).strip().lower()] = m.group(2).strip()
-  return tags
-
 def safe_int(v: str) -> int | None:
   try:
     return int(str(v).strip())
   except Exception:
     return None
 
-def atomic_write_json(path: Path, data: Any):
-  path.parent.mkdir(parents=True, exist_ok=True)
-  tmp = path.with_suffix(path.suffix + ".tmp")
-  tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
-  tmp.replace(path)
-
-def relpath(p: Path) -> str:
-  return str(p.relative_to(ROOT)).replace("\\", "/")
-
 def main():
   if not SONGS_DIR.exists():
     log(f"ERROR: songs folder not found: {SONGS_DIR}")
@@ -100,10 +90,7 @@ def main():
 
   LIB_DIR.mkdir(parents=True, exist_ok=True)
 
-  files: List[Path] = []
-  for ext in CHO_EXTS:
-    files.extend(SONGS_DIR.rglob(f"*{ext}"))
-  files = sorted(set(files))
+  files: List[str] = sorted([e.path for e in iter_cho(str(SONGS_DIR))], key=path_sort_key)
 
   log(f"Scanning {len(files)} song sheets under: {SONGS_DIR}")
 
@@ -111,27 +98,26 @@ def main():
   by_song: Dict[str, Dict[str, Any]] = {}
   orphan = 0
 
-  for i, p in enumerate(files, start=1):
-    if i % 200 == 0:
-      log(f"  ...parsed {i}/{len(files)}")
-    text = p.read_text(encoding="utf-8", errors="replace")
-    tags = parse_tag_block(text)
+  for path in progress(files):
+    p = Path(path)
+    tags = intern_tags(fold_aliases(sheet_tags(path)))
 
-    song_uid = (tags.get("song_uid") or "").strip()
-    uid      = (tags.get("uid") or "").strip()
+    # values come back stripped and alias-folded, so one lookup per field
+    song_uid = tags.get("song_uid", "")
+    uid      = tags.get("uid", "")
 
     if not song_uid:
       orphan += 1
       continue
 
-    title  = tags.get("title") or tags.get("t") or p.stem
-    artist = tags.get("artist") or tags.get("a") or ""
-    persona = tags.get("persona") or tags.get("version") or ""
+    title  = tags.get("title") or p.stem
+    artist = tags.get("artist") or ""
+    persona = tags.get("persona") or ""
     singer  = tags.get("singer") or ""
     duration = tags.get("duration") or ""
-    tempo_i = safe_int(tags.get("tempo") or tags.get("bpm") or "")
-    capo = tags.get("capo") or tags.get("ca") or ""
-    key  = tags.get("key") or tags.get("k") or ""
+    tempo_i = safe_int(tags.get("tempo", ""))
+    capo = tags.get("capo") or ""
+    key  = tags.get("key") or ""
 
     acc = by_song.get(song_uid)
     if not acc:
@@ -148,64 +134,52 @@ def main():
 
     if persona:
       acc["personas"].add(persona)
-      acc["files"][persona] = relpath(p)
+      acc["files"][persona] = relpath(path)
       if uid:
         acc["sheet_uids"][persona] = uid
 
-      acc["meta_by_persona"][persona] = {
-        "uid": uid,
-        "singer": singer,
-        "duration": duration,
-        "tempo": tempo_i,
-        "capo": capo,
-        "key": key
-      }
+      acc["meta_by_persona"][persona] = SheetMeta(uid, singer, duration, tempo_i, capo, key)
     else:
       # no persona/version tag; store as a fallback "default"
-      acc["files"][""] = relpath(p)
+      acc["files"][""] = relpath(path)
       if uid:
         acc["sheet_uids"][""] = uid
-      acc["meta_by_persona"][""] = {
-        "uid": uid,
-        "singer": singer,
-        "duration": duration,
-        "tempo": tempo_i,
-        "capo": capo,
-        "key": key
-      }
+      acc["meta_by_persona"][""] = SheetMeta(uid, singer, duration, tempo_i, capo, key)
 
-  # finalize canonical song list
-  songs_out: List[Dict[str, Any]] = []
+  # finalize canonical song list; (sort key, index, song) so keys are built once
+  decorated: List[Tuple[Tuple[str, str], int, Dict[str, Any]]] = []
   for song_uid, acc in by_song.items():
-    personas = sorted([p for p in acc["personas"] if p])
+    # only non-empty personas are ever added (see the `if persona:` above)
+    personas = sorted(acc["personas"])
     # choose representative persona
     rep_persona = PREFERRED_PERSONA if PREFERRED_PERSONA in personas else (personas[0] if personas else "")
-    rep_meta = acc["meta_by_persona"].get(rep_persona) or next(iter(acc["meta_by_persona"].values()), {})
+    rep_meta = acc["meta_by_persona"].get(rep_persona) or next(iter(acc["meta_by_persona"].values()), SheetMeta())
 
     song = {
       "song_uid": song_uid,
-      "uid": rep_meta.get("uid") or "",
+      "uid": rep_meta.uid or "",
       "title": acc["title"],
       "artist": acc["artist"],
       "personas": personas,
-      "singer": rep_meta.get("singer") or "",
-      "duration": rep_meta.get("duration") or "",
-      "tempo": rep_meta.get("tempo"),
-      "key": rep_meta.get("key") or "",
-      "capo": rep_meta.get("capo") or "",
+      "singer": rep_meta.singer or "",
+      "duration": rep_meta.duration or "",
+      "tempo": rep_meta.tempo,
+      "key": rep_meta.key or "",
+      "capo": rep_meta.capo or "",
       "files": acc["files"],
       "sheet_uids": acc["sheet_uids"],  # NEW
     }
-    songs_out.append(song)
+    decorated.append(((str(acc["artist"]).lower(), str(acc["title"]).lower()), len(decorated), song))
 
-  songs_out.sort(key=lambda s: (str(s.get("artist","")).lower(), str(s.get("title","")).lower()))
+  decorated.sort()
+  songs_out: List[Dict[str, Any]] = [song for _, _, song in decorated]
 
   # Load collections if present in existing library.index.json (so we preserve them)
   collections = []
   existing = OUT_LIB
   if existing.exists():
     try:
-      old = json.loads(existing.read_text(encoding="utf-8"))
+      old = load_json(existing.read_bytes())
       if isinstance(old, dict) and isinstance(old.get("collections"), list):
         collections = old["collections"]
     except Exception:
@@ -225,8 +199,8 @@ def main():
     "songs": songs_out
   }
 
-  atomic_write_json(OUT_SONGS, songs_index)
-  atomic_write_json(OUT_LIB, library_index)
+  atomic_write_bytes(OUT_SONGS, encode_json(songs_index))
+  atomic_write_bytes(OUT_LIB, encode_json(library_index))
 
   log(f"Done. Wrote:\n  {OUT_SONGS}\n  {OUT_LIB}\nCanonical songs: {len(songs_out)} | Orphan sheets: {orphan}")
 
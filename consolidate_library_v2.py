@@ -55,9 +55,13 @@ canonicalSong:
 """
 
 from __future__ import annotations
-import json, re, sys, time
+import json, os, sys, time
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, NamedTuple, Tuple
+
+from _songlib.jsonio import atomic_write_bytes, encode_json, load_json, orjson
+from _songlib.parse import relpath, scan_tags
+from _songlib.progress import progress
 
 ROOT = Path(__file__).resolve().parent
 SONGS_DIR = ROOT / "songs"
@@ -65,26 +69,21 @@ LIB_DIR   = ROOT / "library"
 OUT_SONGS_V2 = LIB_DIR / "songs.index.v2.json"
 OUT_LIB_V2   = LIB_DIR / "library.index.v2.json"
 
-CHO_EXTS = (".cho", ".chopro", ".pro")
-TAG_LINE_RE = re.compile(r'^\s*\{([^}:]+)\s*:\s*(.*?)\}\s*$', re.I)
-
 PREFERRED_PERSONA = "Adam"  # used only to pick representative fields
+WRITE_BUFFER = 1 << 16
+
+class SheetMeta(NamedTuple):
+    # Per-persona representative fields; fixed layout instead of a dict per sheet
+    uid: str = ""
+    singer: str = ""
+    duration: str = ""
+    tempo: int | None = None
+    capo: str = ""
+    key: str = ""
 
 def log(msg: str):
     print(msg, flush=True)
 
-def parse_tag_block(text: str) -> Dict[str, str]:
-    tags: Dict[str, str] = {}
-    for line in text.splitlines():
-        s = line.strip()
-        if s == "":
-            continue
-        m = TAG_LINE_RE.match(s)
-        if not m:
-            break
-        tags[m.group(1).strip().lower()] = m.group(2).strip()
-    return tags
-
 def safe_int(v: str) -> int | None:
     try:
         return int(str(v).strip())
@@ -92,14 +91,18 @@ def safe_int(v: str) -> int | None:
         return None
 
 def atomic_write_json(path: Path, data: Any):
+    if orjson is not None:
+        atomic_write_bytes(path, encode_json(data))
+        return
     path.parent.mkdir(parents=True, exist_ok=True)
     tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    # Stream the stdlib encoder's chunks through a 64 KiB buffer instead of
+    # joining the whole indented document into one string first
+    with open(tmp, "w", encoding="utf-8", newline="\n", buffering=WRITE_BUFFER) as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write("\n")
     tmp.replace(path)
 
-def relpath(p: Path) -> str:
-    return str(p.relative_to(ROOT)).replace("\\", "/")
-
 def main():
     t0 = time.time()
 
@@ -109,109 +112,89 @@ def main():
 
     LIB_DIR.mkdir(parents=True, exist_ok=True)
 
-    files: List[Path] = []
-    for ext in CHO_EXTS:
-        files.extend(SONGS_DIR.rglob(f"*{ext}"))
-    files = sorted(set(files))
+    files = scan_tags()
 
     log(f"Scanning {len(files)} song sheets under: {SONGS_DIR}")
 
     by_song: Dict[str, Dict[str, Any]] = {}
     orphan = 0
 
-    for i, p in enumerate(files, start=1):
-        if i % 200 == 0:
-            log(f"  ...parsed {i}/{len(files)}")
-        text = p.read_text(encoding="utf-8", errors="replace")
-        tags = parse_tag_block(text)
+    for path, tags in progress(files):
+        if isinstance(tags, Exception):
+            log(f"WARN: failed read {path}: {tags}")
+            continue
 
-        song_uid = (tags.get("song_uid") or "").strip()
-        uid = (tags.get("uid") or "").strip()
+        # values come back stripped; one bound get serves every field
+        get = tags.get
+        song_uid = get("song_uid") or ""
+        uid = get("uid") or ""
         if not song_uid:
             orphan += 1
             continue
 
-        title = tags.get("title") or tags.get("t") or p.stem
-        artist = tags.get("artist") or tags.get("a") or ""
-        persona = tags.get("persona") or tags.get("version") or ""
-        singer = tags.get("singer") or ""
-        duration = tags.get("duration") or ""
-        tempo = safe_int(tags.get("tempo") or tags.get("bpm") or "")
-        capo = tags.get("capo") or tags.get("ca") or ""
-        key = tags.get("key") or tags.get("k") or ""
+        title = get("title") or get("t") or os.path.splitext(os.path.basename(path))[0]
+        artist = get("artist") or get("a") or ""
+        # scan_tags already interns the low-cardinality values (see INTERNED_TAGS)
+        persona = get("persona") or get("version") or ""
+        singer = get("singer") or ""
+        duration = get("duration") or ""
+        tempo = safe_int(get("tempo") or get("bpm") or "")
+        capo = get("capo") or get("ca") or ""
+        key = get("key") or get("k") or ""
 
         acc = by_song.get(song_uid)
-        if not acc:
-            acc = {
+        if acc is None:
+            acc = by_song[song_uid] = {
                 "song_uid": song_uid,
                 "title": title,
                 "artist": artist,
-                "personas": set(),
                 "files": {},
                 "sheet_uids": {},
                 "meta_by_persona": {}
             }
-            by_song[song_uid] = acc
-
-        # Maintain canonical title/artist if first sheet had them; ignore later drift
-        if persona:
-            acc["personas"].add(persona)
-            acc["files"][persona] = relpath(p)
-            if uid:
-                acc["sheet_uids"][persona] = uid
-            acc["meta_by_persona"][persona] = {
-                "uid": uid,
-                "singer": singer,
-                "duration": duration,
-                "tempo": tempo,
-                "capo": capo,
-                "key": key
-            }
-        else:
-            # fallback bucket if persona isn't set
-            acc["files"][""] = relpath(p)
-            if uid:
-                acc["sheet_uids"][""] = uid
-            acc["meta_by_persona"][""] = {
-                "uid": uid,
-                "singer": singer,
-                "duration": duration,
-                "tempo": tempo,
-                "capo": capo,
-                "key": key
-            }
+
+        # Maintain canonical title/artist if first sheet had them; ignore later drift.
+        # An empty persona is the fallback bucket; the non-empty keys of "files"
+        # double as the song's persona set.
+        acc["files"][persona] = relpath(path)
+        if uid:
+            acc["sheet_uids"][persona] = uid
+        acc["meta_by_persona"][persona] = SheetMeta(uid, singer, duration, tempo, capo, key)
 
     # Build canonical list
-    songs_out: List[Dict[str, Any]] = []
+    decorated: List[Tuple[Tuple[str, str], int, Dict[str, Any]]] = []
     for song_uid, acc in by_song.items():
-        personas = sorted([p for p in acc["personas"] if p])
+        personas = sorted([p for p in acc["files"] if p])
 
         rep_persona = PREFERRED_PERSONA if PREFERRED_PERSONA in personas else (personas[0] if personas else "")
-        rep_meta = acc["meta_by_persona"].get(rep_persona) or next(iter(acc["meta_by_persona"].values()), {})
+        rep_meta = acc["meta_by_persona"].get(rep_persona) or next(iter(acc["meta_by_persona"].values()), SheetMeta())
 
-        songs_out.append({
+        song = {
             "song_uid": song_uid,
-            "uid": rep_meta.get("uid") or "",
+            "uid": rep_meta.uid or "",
             "title": acc["title"],
             "artist": acc["artist"],
             "personas": personas,
-            "singer": rep_meta.get("singer") or "",
-            "duration": rep_meta.get("duration") or "",
-            "tempo": rep_meta.get("tempo"),
-            "key": rep_meta.get("key") or "",
-            "capo": rep_meta.get("capo") or "",
+            "singer": rep_meta.singer or "",
+            "duration": rep_meta.duration or "",
+            "tempo": rep_meta.tempo,
+            "key": rep_meta.key or "",
+            "capo": rep_meta.capo or "",
             "files": acc["files"],
             "sheet_uids": acc["sheet_uids"]
-        })
+        }
+        # Sort key built once per song; the index keeps equal keys in insertion order
+        decorated.append(((str(acc["artist"]).lower(), str(acc["title"]).lower()), len(decorated), song))
 
-    songs_out.sort(key=lambda s: (str(s.get("artist","")).lower(), str(s.get("title","")).lower()))
+    decorated.sort()
+    songs_out: List[Dict[str, Any]] = [song for _, _, song in decorated]
 
     # Carry forward collections from legacy library.index.json if present
     legacy_lib = LIB_DIR / "library.index.json"
     collections = []
     if legacy_lib.exists():
         try:
-            old = json.loads(legacy_lib.read_text(encoding="utf-8"))
+            old = load_json(legacy_lib.read_bytes())
             if isinstance(old, dict) and isinstance(old.get("collections"), list):
                 collections = old["collections"]
         except Exception:
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+migrate_all.py
+--------------
+
+Runs the song_uid builds back to back in one process:
+
+  consolidate_library_v2.py       -> library/songs.index.v2.json, library/library.index.v2.json
+  migrate_setlists_to_songuid.py  -> library/setlists.migrated.json
+  migrate_setlists_v2.py          -> library/setlists.v2.json
+
+The three share _songlib.parse, whose scan is memoized, so ./songs/ is walked
+and parsed once instead of once per script.
+
+Run:
+  python3 migrate_all.py
+"""
+
+import consolidate_library_v2
+import migrate_setlists_to_songuid
+import migrate_setlists_v2
+
+def main():
+    consolidate_library_v2.main()
+    migrate_setlists_to_songuid.main()
+    migrate_setlists_v2.main()
+
+if __name__ == "__main__":
+    main()
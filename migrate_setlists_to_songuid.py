@@ -3,7 +3,7 @@
 One-time migration: setlists.json -> song_uid canonical
 
 - Reads ./library/setlists.json
-- Builds uid -> song_uid map from ./songs/**/*.cho tag blocks
+- Builds uid -> song_uid map from ./songs/**/*.cho tag blocks (cached by _songlib/parse.py)
 - Rewrites each set item to include song_uid, and de-dupes per set by song_uid
 - Writes ./library/setlists.migrated.json (does not overwrite originals)
 
@@ -12,50 +12,26 @@ Run:
 """
 
 from __future__ import annotations
-import json, re, time
+import time
 from pathlib import Path
 
+from _songlib.jsonio import encode_json, load_json
+from _songlib.parse import get_uid_map, scan_errors
+
 ROOT = Path(__file__).resolve().parent
-SONGS_DIR = ROOT / "songs"
 LIB_DIR   = ROOT / "library"
 IN_FILE   = LIB_DIR / "setlists.json"
 OUT_FILE  = LIB_DIR / "setlists.migrated.json"
 
-TAG_LINE_RE = re.compile(r'^\s*\{([^}:]+)\s*:\s*(.*?)\}\s*$', re.I)
-
-def parse_tag_block(text: str):
-    tags = {}
-    for line in text.splitlines():
-        s = line.strip()
-        if s == "":
-            continue
-        m = TAG_LINE_RE.match(s)
-        if not m:
-            break
-        tags[m.group(1).strip().lower()] = m.group(2).strip()
-    return tags
-
-def build_uid_map():
-    m = {}
-    for p in SONGS_DIR.rglob("*.cho"):
-        try:
-            txt = p.read_text(encoding="utf-8", errors="replace")
-        except Exception:
-            continue
-        tags = parse_tag_block(txt)
-        uid = (tags.get("uid") or "").strip()
-        song_uid = (tags.get("song_uid") or "").strip()
-        if uid and song_uid:
-            m[uid] = song_uid
-    return m
-
 def main():
     if not IN_FILE.exists():
         print(f"ERROR: missing {IN_FILE}")
         return
 
-    uid_map = build_uid_map()
-    data = json.loads(IN_FILE.read_text(encoding="utf-8"))
+    uid_map = get_uid_map()
+    for path, err in scan_errors():
+        print(f"WARN: failed read {path}: {err}")
+    data = load_json(IN_FILE.read_bytes())
 
     def item_key(it):
         return (it.get("song_uid") or it.get("uid") or "").strip()
@@ -98,7 +74,7 @@ def main():
             st["songs"] = new_songs
 
     out = {"collections": collections} if isinstance(data, dict) else collections
-    OUT_FILE.write_text(json.dumps(out, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    OUT_FILE.write_bytes(encode_json(out))
     print(f"Done. Wrote {OUT_FILE}. Items changed/removed: {changed}")
 
 if __name__ == "__main__":
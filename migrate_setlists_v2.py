@@ -12,46 +12,24 @@ It converts any uid -> song_uid using tag blocks in songs/**/*.cho
 It also de-dupes within each set by song_uid while preserving order.
 """
 
-import json, re
 from pathlib import Path
 
+from _songlib.jsonio import encode_json, load_json
+from _songlib.parse import get_uid_map, scan_errors
+
 ROOT = Path(__file__).resolve().parent
-SONGS_DIR = ROOT / "songs"
 LIB_DIR = ROOT / "library"
 IN_FILE = LIB_DIR / "setlists.json"
 OUT_FILE = LIB_DIR / "setlists.v2.json"
 
-TAG_LINE_RE = re.compile(r'^\s*\{([^}:]+)\s*:\s*(.*?)\}\s*$', re.I)
-
-def parse_tag_block(text: str):
-    tags = {}
-    for line in text.splitlines():
-        s = line.strip()
-        if not s:
-            continue
-        m = TAG_LINE_RE.match(s)
-        if not m:
-            break
-        tags[m.group(1).strip().lower()] = m.group(2).strip()
-    return tags
-
-def build_uid_to_songuid():
-    m = {}
-    for p in SONGS_DIR.rglob("*.cho"):
-        txt = p.read_text(encoding="utf-8", errors="replace")
-        tags = parse_tag_block(txt)
-        uid = (tags.get("uid") or "").strip()
-        song_uid = (tags.get("song_uid") or "").strip()
-        if uid and song_uid:
-            m[uid] = song_uid
-    return m
-
 def main():
     if not IN_FILE.exists():
         raise SystemExit(f"Missing {IN_FILE}")
 
-    uid_map = build_uid_to_songuid()
-    data = json.loads(IN_FILE.read_text(encoding="utf-8"))
+    uid_map = get_uid_map()
+    for path, err in scan_errors():
+        print(f"WARN: failed read {path}: {err}")
+    data = load_json(IN_FILE.read_bytes())
 
     collections = data.get("collections") if isinstance(data, dict) else None
     if not isinstance(collections, list):
@@ -67,8 +45,7 @@ def main():
             if not isinstance(songs, list):
                 continue
 
-            new_list = []
-            seen = set()
+            keys = []
 
             for item in songs:
                 if not isinstance(item, str):
@@ -84,13 +61,11 @@ def main():
                     else:
                         unresolved += 1  # uid not found in map; keep as-is for now
 
-                # De-dupe within set
-                if key in seen:
-                    removed_dupes += 1
-                    continue
-                seen.add(key)
-                new_list.append(key)
+                keys.append(key)
 
+            # De-dupe within set, keeping first occurrences in order
+            new_list = list(dict.fromkeys(keys))
+            removed_dupes += len(keys) - len(new_list)
             st["songs"] = new_list
 
     out = {
@@ -98,7 +73,7 @@ def main():
         "contract": "song_uid_v2",
         "collections": collections
     }
-    OUT_FILE.write_text(json.dumps(out, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    OUT_FILE.write_bytes(encode_json(out))
     print(f"Done. Wrote {OUT_FILE}")
     print(f"converted:{changed} removed_dupes:{removed_dupes} unresolved_uids:{unresolved}")
 